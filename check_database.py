@@ -14,18 +14,20 @@ def check_database():
             print("🔍 Checking PostgreSQL setup...")
             print("=" * 50)
             
-            # List all databases
+            # List all databases and check for stock_data in one round trip
             print("📋 All databases:")
-            result = conn.execute(text("SELECT datname FROM pg_database WHERE datistemplate = false"))
-            databases = [row[0] for row in result.fetchall()]
-            for db in databases:
+            result = conn.execute(text("""
+                SELECT array_agg(datname) FILTER (WHERE NOT datistemplate),
+                       bool_or(datname = 'stock_data')
+                FROM pg_database
+            """))
+            databases, stock_data_exists = result.fetchone()
+            for db in databases or []:
                 print(f"  - {db}")
             
             print("\n" + "=" * 50)
             
-            # Check if stock_data database exists
-            result = conn.execute(text("SELECT datname FROM pg_database WHERE datname = 'stock_data'"))
-            if result.fetchone():
+            if stock_data_exists:
                 print("✅ stock_data database exists")
                 
                 # Try to connect to stock_data and check tables
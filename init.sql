@@ -3,10 +3,10 @@ CREATE TABLE IF NOT EXISTS stock_data (
     id SERIAL PRIMARY KEY,
     symbol VARCHAR(10) NOT NULL,
     timestamp TIMESTAMP NOT NULL,
-    open_price DECIMAL(10,4),
-    high_price DECIMAL(10,4),
-    low_price DECIMAL(10,4),
-    close_price DECIMAL(10,4),
+    open_price DOUBLE PRECISION,
+    high_price DOUBLE PRECISION,
+    low_price DOUBLE PRECISION,
+    close_price DOUBLE PRECISION,
     volume BIGINT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -17,9 +17,14 @@ CREATE TABLE IF NOT EXISTS stock_data (
 CREATE INDEX IF NOT EXISTS idx_stock_data_symbol_timestamp 
 ON stock_data(symbol, timestamp);
 
--- Create index for time-based queries
-CREATE INDEX IF NOT EXISTS idx_stock_data_timestamp 
-ON stock_data(timestamp);
+-- Create BRIN index for time-based range scans (append-only, so a
+-- block-range index is far smaller than a btree)
+CREATE INDEX IF NOT EXISTS idx_stock_data_timestamp_brin 
+ON stock_data USING BRIN (timestamp) WITH (pages_per_range = 32);
+
+-- Create covering index for latest-N queries (BRIN can't serve ORDER BY ... LIMIT)
+CREATE INDEX IF NOT EXISTS idx_stock_data_timestamp_desc 
+ON stock_data (timestamp DESC) INCLUDE (symbol, close_price, volume);
 
 -- Create a function to update the updated_at column
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -4,12 +4,17 @@ Dashboard Launcher Script
 Simple script to launch the Streamlit dashboard
 """
 
+import importlib.util
 import subprocess
 import sys
 import os
 
 def check_dependencies():
     """Check if required packages are installed"""
+    # Set SKIP_DEP_CHECK in CI/containers where dependencies are known to exist
+    if os.environ.get("SKIP_DEP_CHECK"):
+        return []
+    
     required_packages = [
         'streamlit',
         'plotly',
@@ -21,9 +26,8 @@ def check_dependencies():
     missing_packages = []
     
     for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
+        # find_spec locates the package without executing its import-time code
+        if importlib.util.find_spec(package) is None:
             missing_packages.append(package)
     
     return missing_packages
@@ -1,3 +1,9 @@
-from .stock_pipeline import stock_data_pipeline
-
 __all__ = ["stock_data_pipeline"]
+
+def __getattr__(name):
+    # The asset module imports all of dagster; load it only when it is asked for,
+    # so lightweight submodules (cache, schema) can be imported on their own
+    if name == "stock_data_pipeline":
+        from .stock_pipeline import stock_data_pipeline
+        return stock_data_pipeline
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
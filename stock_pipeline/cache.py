@@ -0,0 +1,87 @@
+"""
+On-disk cache for Alpha Vantage API responses.
+
+Responses are stored as JSON under {path}/alphavantage/{function}/{symbol}/ and
+keyed on (symbol, interval), so repeated pipeline runs within a bar's lifetime
+skip the HTTP round trip entirely.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# A new intraday bar closes once per interval, so cached payloads expire on the same cadence
+INTERVAL_TTLS = {
+    '1min': 60,
+    '5min': 300,
+    '15min': 900,
+    '30min': 1800,
+    '60min': 3600
+}
+
+class FileCache:
+    """TTL-based JSON file cache for API responses"""
+    
+    def __init__(self, path: Optional[str] = None, ttl: int = 300, function: str = 'TIME_SERIES_INTRADAY'):
+        """
+        Args:
+            path: Cache root directory (defaults to ALPHA_VANTAGE_CACHE_DIR or .cache)
+            ttl: Time-to-live in seconds for entries without an interval in INTERVAL_TTLS
+            function: Alpha Vantage function the payloads come from; each gets its own directory
+        """
+        root = path or os.getenv('ALPHA_VANTAGE_CACHE_DIR', '.cache')
+        self.root = os.path.join(root, 'alphavantage', function.lower())
+        self.ttl = ttl
+    
+    def _path(self, symbol: str, interval: str) -> str:
+        key = hashlib.md5(f"{symbol}:{interval}".encode()).hexdigest()
+        return os.path.join(self.root, symbol, f"{interval}_{key}.json")
+    
+    def ttl_for(self, interval: str) -> int:
+        """Time-to-live in seconds for the given interval"""
+        return INTERVAL_TTLS.get(interval, self.ttl)
+    
+    def get(self, symbol: str, interval: str = 'latest', max_age: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached payload, or None if missing, expired or unreadable
+        
+        Args:
+            symbol: Stock symbol
+            interval: Time interval the payload was fetched for ('latest' for non-intraday functions)
+            max_age: Maximum entry age in seconds, in place of the TTL (e.g. a longer
+                window for falling back to a last good response)
+        """
+        try:
+            with open(self._path(symbol, interval), 'r') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry for {symbol} ({interval}): {str(e)}")
+            return None
+        
+        limit = self.ttl_for(interval) if max_age is None else max_age
+        if time.time() - entry.get('ts', 0) > limit:
+            return None
+        
+        return entry.get('payload')
+    
+    def set(self, symbol: str, interval: str, data: Dict[str, Any]) -> None:
+        """Store a payload; failures are logged and otherwise ignored"""
+        path = self._path(symbol, interval)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'ts': time.time(), 'payload': data}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry for {symbol} ({interval}): {str(e)}")
@@ -0,0 +1,555 @@
+"""
+Shared stock data core
+
+Alpha Vantage client, PostgreSQL writer and the fetch/parse/store flow used by
+both the Dagster asset (stock_pipeline.py) and the standalone fetcher
+(data_fetcher.py). The engine, HTTP session and response cache are process-wide
+so every entry point reuses the same warm connections.
+"""
+
+import io
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pandas as pd
+from psycopg2.extras import execute_values
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import create_engine, text
+
+try:
+    # Faster JSON decoding straight from response bytes; falls back to response.json()
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from .cache import FileCache
+    from .schema import STOCK_DATA_COLUMNS, UPSERT_VALUES_SQL
+except ImportError:
+    # Executed as a script from inside the package directory
+    from cache import FileCache
+    from schema import STOCK_DATA_COLUMNS, UPSERT_VALUES_SQL
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on in-flight Alpha Vantage requests
+MAX_CONCURRENT_FETCHES = 5
+
+# Batches up to this size go through execute_values; larger ones use COPY
+COPY_THRESHOLD = 1000
+
+# Alpha Vantage time series field -> stock_data column
+TIME_SERIES_FIELDS = {
+    '1. open': 'open_price',
+    '2. high': 'high_price',
+    '3. low': 'low_price',
+    '4. close': 'close_price',
+    '5. volume': 'volume'
+}
+
+CREATE_STAGING_SQL = """
+    CREATE TEMP TABLE stock_data_staging ON COMMIT DROP AS
+    SELECT symbol, timestamp, open_price, high_price, low_price, close_price, volume
+    FROM stock_data WITH NO DATA
+"""
+
+COPY_STAGING_SQL = (
+    "COPY stock_data_staging (symbol, timestamp, open_price, high_price, low_price, close_price, volume) "
+    "FROM STDIN WITH (FORMAT CSV)"
+)
+
+# Alpha Vantage's datatype=csv output is timestamp,open,high,low,close,volume
+COPY_CSV_STAGING_SQL = (
+    "COPY stock_data_staging (timestamp, open_price, high_price, low_price, close_price, volume) "
+    "FROM STDIN WITH (FORMAT CSV)"
+)
+
+UPSERT_FROM_STAGING_SQL = """
+    INSERT INTO stock_data
+    (symbol, timestamp, open_price, high_price, low_price, close_price, volume)
+    SELECT DISTINCT ON (symbol, timestamp)
+        symbol, timestamp, open_price, high_price, low_price, close_price, volume
+    FROM stock_data_staging
+    ON CONFLICT (symbol, timestamp) DO UPDATE SET
+    open_price = EXCLUDED.open_price,
+    high_price = EXCLUDED.high_price,
+    low_price = EXCLUDED.low_price,
+    close_price = EXCLUDED.close_price,
+    volume = EXCLUDED.volume
+"""
+
+_ENGINES = {}
+_SESSION = None
+
+# Caps in-flight API calls process-wide, even across concurrent fetch_many callers
+_FETCH_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_FETCHES)
+
+def default_db_url() -> str:
+    """Build the database URL from environment variables"""
+    return (
+        f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:"
+        f"{os.getenv('POSTGRES_PASSWORD', 'admin')}@"
+        f"{os.getenv('POSTGRES_HOST', 'localhost')}:5432/"
+        f"{os.getenv('POSTGRES_DB', 'stock_data')}"
+    )
+
+def get_engine(db_url: Optional[str] = None):
+    """Return the process-wide SQLAlchemy engine for a URL, creating it on first use"""
+    db_url = db_url or default_db_url()
+    if db_url not in _ENGINES:
+        _ENGINES[db_url] = create_engine(
+            db_url,
+            pool_size=5,
+            max_overflow=10,
+            pool_pre_ping=True,
+            pool_recycle=300
+        )
+    return _ENGINES[db_url]
+
+def get_session() -> requests.Session:
+    """Return the process-wide HTTP session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None:
+        # Pooled keep-alive session so repeated fetches reuse one TLS connection
+        _SESSION = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        _SESSION.mount('https://', adapter)
+    return _SESSION
+
+class DatabaseManager:
+    """Manages database connections and operations"""
+    
+    def __init__(self, db_url: Optional[str] = None):
+        """
+        Args:
+            db_url: PostgreSQL connection URL (defaults to environment variables)
+        """
+        self.db_url = db_url or default_db_url()
+        self.engine = None
+        self._connect()
+    
+    def _connect(self):
+        """Establish database connection"""
+        try:
+            # Shared across instances in the same process so the connection pool stays warm
+            self.engine = get_engine(self.db_url)
+            # Test connection
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            logger.info("Database connection established successfully")
+        except Exception as e:
+            logger.error(f"Database connection failed: {str(e)}")
+            raise
+    
+    def check_table_exists(self) -> bool:
+        """Check if stock_data table exists"""
+        try:
+            # Single catalog lookup instead of listing every table in the schema
+            with self.engine.connect() as conn:
+                return conn.execute(text("SELECT to_regclass('public.stock_data') IS NOT NULL")).scalar()
+        except Exception as e:
+            logger.error(f"Error checking table existence: {str(e)}")
+            return False
+    
+    def _upsert(self, conn, data: pd.DataFrame) -> None:
+        """Write a batch through the given connection's DBAPI cursor"""
+        # A single INSERT cannot touch the same key twice; dedupe before picking a
+        # path so the last duplicate wins whatever the batch size
+        data = data.drop_duplicates(['symbol', 'timestamp'], keep='last')
+        
+        cursor = conn.connection.cursor()
+        try:
+            if len(data) <= COPY_THRESHOLD:
+                # Small batches: one multi-VALUES upsert, no staging table
+                rows = list(data[STOCK_DATA_COLUMNS].itertuples(index=False, name=None))
+                execute_values(cursor, UPSERT_VALUES_SQL, rows, page_size=COPY_THRESHOLD)
+            else:
+                # Large batches: COPY into a temp staging table, then upsert in one statement
+                buf = io.StringIO()
+                data[STOCK_DATA_COLUMNS].to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                cursor.execute("DROP TABLE IF EXISTS stock_data_staging")
+                cursor.execute(CREATE_STAGING_SQL)
+                cursor.copy_expert(COPY_STAGING_SQL, buf)
+                cursor.execute(UPSERT_FROM_STAGING_SQL)
+        finally:
+            cursor.close()
+    
+    def insert_stock_data(self, data: pd.DataFrame) -> int:
+        """
+        Insert stock data into database
+        
+        Args:
+            data: Parsed stock data
+        
+        Returns:
+            Number of records inserted or updated
+        """
+        try:
+            if data.empty:
+                logger.warning("No data to insert")
+                return 0
+            
+            with self.engine.begin() as conn:
+                self._upsert(conn, data)
+            
+            logger.info(f"Successfully inserted/updated {len(data)} records")
+            return len(data)
+        
+        except Exception as e:
+            logger.error(f"Error inserting data: {str(e)}")
+            raise
+
+    def copy_csv_stream(self, symbol: str, stream) -> int:
+        """
+        Upsert an Alpha Vantage CSV stream straight through COPY
+        
+        Args:
+            symbol: Stock symbol the rows belong to
+            stream: File-like object positioned after the CSV header line
+        
+        Returns:
+            Number of rows copied from the stream
+        """
+        try:
+            with self.engine.begin() as conn:
+                cursor = conn.connection.cursor()
+                try:
+                    cursor.execute("DROP TABLE IF EXISTS stock_data_staging")
+                    cursor.execute(CREATE_STAGING_SQL)
+                    # The CSV has no symbol column, so COPY fills it from the default
+                    cursor.execute("ALTER TABLE stock_data_staging ALTER COLUMN symbol SET DEFAULT %s", (symbol,))
+                    cursor.copy_expert(COPY_CSV_STAGING_SQL, stream)
+                    copied = cursor.rowcount
+                    cursor.execute(UPSERT_FROM_STAGING_SQL)
+                finally:
+                    cursor.close()
+            
+            logger.info(f"Successfully streamed {copied} records for {symbol}")
+            return copied
+            
+        except Exception as e:
+            logger.error(f"Error streaming data for {symbol}: {str(e)}")
+            raise
+
+class AlphaVantageAPI:
+    """Handles Alpha Vantage API interactions"""
+    
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Args:
+            api_key: Alpha Vantage API key (defaults to environment variable)
+        """
+        self.api_key = api_key or os.getenv('ALPHA_VANTAGE_API_KEY', 'demo')
+        self.base_url = "https://www.alphavantage.co/query"
+        self.cache = FileCache()
+        self.session = get_session()
+    
+    def fetch_stock_data(self, symbol: str, interval: str = "5min") -> Dict[str, Any]:
+        """
+        Fetch stock data from Alpha Vantage API
+        
+        Args:
+            symbol: Stock symbol (e.g., 'IBM', 'AAPL')
+            interval: Time interval ('1min', '5min', '15min', '30min', '60min')
+        
+        Returns:
+            Dictionary containing the API response
+        """
+        cached = self.cache.get(symbol, interval)
+        if cached is not None:
+            logger.info(f"Using cached data for {symbol}")
+            return cached
+        
+        try:
+            params = {
+                'function': 'TIME_SERIES_INTRADAY',
+                'symbol': symbol,
+                'interval': interval,
+                'apikey': self.api_key
+            }
+            
+            logger.info(f"Fetching data for {symbol}")
+            with _FETCH_SLOTS:
+                response = self.session.get(self.base_url, params=params, timeout=30)
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content) if orjson is not None else response.json()
+            
+            # Check for API errors
+            if 'Error Message' in data:
+                raise Exception(f"API Error: {data['Error Message']}")
+            
+            if 'Note' in data:
+                logger.warning(f"API Rate Limit: {data['Note']}")
+                return {}
+            
+            # Only cache real time series payloads, never rate-limit or info notices
+            if any(key.startswith('Time Series') for key in data):
+                self.cache.set(symbol, interval, data)
+            
+            return data
+        
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Request failed for {symbol}: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching data for {symbol}: {str(e)}")
+            raise
+    
+    def open_csv_stream(self, symbol: str, interval: str = "5min"):
+        """
+        Request intraday data as CSV without buffering the body
+        
+        Args:
+            symbol: Stock symbol (e.g., 'IBM', 'AAPL')
+            interval: Time interval ('1min', '5min', '15min', '30min', '60min')
+        
+        Returns:
+            Tuple of (response, text stream positioned after the header line);
+            the caller closes the response
+        """
+        params = {
+            'function': 'TIME_SERIES_INTRADAY',
+            'symbol': symbol,
+            'interval': interval,
+            'datatype': 'csv',
+            'apikey': self.api_key
+        }
+        
+        logger.info(f"Streaming CSV data for {symbol}")
+        with _FETCH_SLOTS:
+            response = self.session.get(self.base_url, params=params, timeout=30, stream=True)
+        
+        try:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            stream = io.TextIOWrapper(response.raw, encoding='utf-8', newline='')
+            
+            header = stream.readline()
+            if not header.startswith('timestamp'):
+                # Errors and rate-limit notes come back as JSON even with datatype=csv
+                body = header + stream.read()
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    data = {}
+                message = data.get('Error Message') or data.get('Note') or data.get('Information') or body[:200]
+                raise Exception(f"API Error: {message}")
+            
+            return response, stream
+            
+        except Exception as e:
+            response.close()
+            logger.error(f"Error streaming data for {symbol}: {str(e)}")
+            raise
+    
+    def fetch_many(self, symbols: List[str], interval: str = "5min") -> Dict[str, Any]:
+        """
+        Fetch several symbols concurrently
+        
+        Args:
+            symbols: Stock symbols to fetch
+            interval: Time interval for data
+        
+        Returns:
+            Dictionary mapping each symbol to its API response, or to the
+            exception raised while fetching it
+        """
+        # requests releases the GIL while waiting on the socket, so threads overlap the RTTs
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES) as executor:
+            futures = {symbol: executor.submit(self.fetch_stock_data, symbol, interval) for symbol in symbols}
+        
+        payloads = {}
+        for symbol, future in futures.items():
+            try:
+                payloads[symbol] = future.result()
+            except Exception as e:
+                payloads[symbol] = e
+        return payloads
+    
+    def parse_stock_data(self, data: Dict[str, Any], symbol: str) -> pd.DataFrame:
+        """
+        Parse API response into structured DataFrame
+        
+        Args:
+            data: Raw API response
+            symbol: Stock symbol
+        
+        Returns:
+            DataFrame with parsed stock data
+        """
+        try:
+            if not data:
+                return pd.DataFrame()
+            
+            # Extract time series data
+            time_series_key = f"Time Series ({data.get('Meta Data', {}).get('4. Interval', '5min')})"
+            
+            if time_series_key not in data:
+                logger.warning(f"No time series data found for {symbol}")
+                return pd.DataFrame()
+            
+            time_series_data = data[time_series_key]
+            
+            # Parse the whole series at once instead of row by row
+            df = pd.DataFrame.from_dict(time_series_data, orient='index')
+            df = df.reindex(columns=list(TIME_SERIES_FIELDS)).fillna(0).rename(columns=TIME_SERIES_FIELDS)
+            for column in TIME_SERIES_FIELDS.values():
+                df[column] = pd.to_numeric(df[column], errors='coerce')
+            df['timestamp'] = pd.to_datetime(df.index, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+            df['symbol'] = symbol
+            
+            # Drop malformed records, as the per-row parser used to
+            invalid = df.isna().any(axis=1)
+            if invalid.any():
+                logger.warning(f"Skipped {int(invalid.sum())} malformed records for {symbol}")
+                df = df[~invalid]
+            
+            df = df.astype({
+                'open_price': 'float64',
+                'high_price': 'float64',
+                'low_price': 'float64',
+                'close_price': 'float64',
+                'volume': 'int64'
+            })[STOCK_DATA_COLUMNS].reset_index(drop=True)
+            # Smallest integer type that holds the batch; prices stay float64 to match DOUBLE PRECISION
+            df['volume'] = pd.to_numeric(df['volume'], downcast='integer')
+            logger.info(f"Parsed {len(df)} records for {symbol}")
+            return df
+        
+        except Exception as e:
+            logger.error(f"Error parsing data for {symbol}: {str(e)}")
+            raise
+
+class StockCore:
+    """Fetch, parse and store flow shared by the Dagster asset and the CLI fetcher"""
+    
+    def __init__(self, api_key: Optional[str] = None, db_url: Optional[str] = None):
+        """
+        Args:
+            api_key: Alpha Vantage API key (defaults to environment variable)
+            db_url: PostgreSQL connection URL (defaults to environment variables)
+        """
+        self.api = AlphaVantageAPI(api_key)
+        self.db = DatabaseManager(db_url)
+    
+    def check_table_exists(self) -> bool:
+        """Check if stock_data table exists"""
+        return self.db.check_table_exists()
+    
+    def process_symbols(self, symbols: List[str], interval: str = "5min",
+                        stream_csv: bool = False) -> List[Dict[str, Any]]:
+        """
+        Fetch, parse and store several symbols
+        
+        Fetches run concurrently, parsing is sequential, and every parsed
+        symbol is written in a single batch and transaction.
+        
+        Args:
+            symbols: Stock symbols to process
+            interval: Time interval for data
+            stream_csv: Pipe each symbol's CSV response straight into COPY
+                instead (bypasses JSON parsing and the response cache)
+        
+        Returns:
+            One result dictionary per distinct symbol, in input order
+        """
+        symbols = list(dict.fromkeys(symbols))
+        
+        if stream_csv:
+            with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES) as executor:
+                return list(executor.map(lambda symbol: self._stream_symbol(symbol, interval), symbols))
+        
+        payloads = self.api.fetch_many(symbols, interval)
+        
+        results = {}
+        parsed_frames = {}
+        
+        for symbol in symbols:
+            try:
+                logger.info(f"Processing symbol: {symbol}")
+                
+                raw_data = payloads[symbol]
+                if isinstance(raw_data, Exception):
+                    raise raw_data
+                
+                if not raw_data:
+                    results[symbol] = self._failed(symbol, 'No data received from API')
+                    continue
+                
+                df = self.api.parse_stock_data(raw_data, symbol)
+                
+                if df.empty:
+                    results[symbol] = self._failed(symbol, 'No data parsed successfully')
+                    continue
+                
+                parsed_frames[symbol] = df
+            
+            except Exception as e:
+                logger.error(f"Failed to process {symbol}: {str(e)}")
+                results[symbol] = self._failed(symbol, str(e))
+        
+        # Store every parsed symbol in a single batch and transaction
+        if parsed_frames:
+            try:
+                self.db.insert_stock_data(pd.concat(parsed_frames.values(), ignore_index=True))
+                
+                for symbol, df in parsed_frames.items():
+                    logger.info(f"Successfully processed {symbol}: {len(df)} records")
+                    results[symbol] = self._succeeded(symbol, len(df))
+            
+            except Exception as e:
+                logger.error(f"Failed to store parsed data: {str(e)}")
+                for symbol in parsed_frames:
+                    results[symbol] = self._failed(symbol, str(e))
+        
+        return [results[symbol] for symbol in symbols]
+    
+    def _stream_symbol(self, symbol: str, interval: str) -> Dict[str, Any]:
+        """Stream one symbol from the API into the database"""
+        try:
+            logger.info(f"Processing symbol: {symbol}")
+            
+            response, stream = self.api.open_csv_stream(symbol, interval)
+            try:
+                records = self.db.copy_csv_stream(symbol, stream)
+            finally:
+                response.close()
+            
+            if not records:
+                return self._failed(symbol, 'No data received from API')
+            
+            return self._succeeded(symbol, records)
+            
+        except Exception as e:
+            logger.error(f"Failed to process {symbol}: {str(e)}")
+            return self._failed(symbol, str(e))
+    
+    @staticmethod
+    def _succeeded(symbol: str, records: int) -> Dict[str, Any]:
+        return {
+            'symbol': symbol,
+            'status': 'success',
+            'records_processed': records,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def _failed(symbol: str, reason: str) -> Dict[str, Any]:
+        return {
+            'symbol': symbol,
+            'status': 'failed',
+            'reason': reason,
+            'records_processed': 0
+        }
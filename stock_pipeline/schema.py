@@ -0,0 +1,21 @@
+"""
+stock_data table layout and upsert statement
+
+Kept free of third-party imports so schema tooling (setup_database.py) can
+share them with the pipeline writer without loading pandas, requests or
+dagster.
+"""
+
+STOCK_DATA_COLUMNS = ['symbol', 'timestamp', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+UPSERT_VALUES_SQL = """
+    INSERT INTO stock_data
+    (symbol, timestamp, open_price, high_price, low_price, close_price, volume)
+    VALUES %s
+    ON CONFLICT (symbol, timestamp) DO UPDATE SET
+    open_price = EXCLUDED.open_price,
+    high_price = EXCLUDED.high_price,
+    low_price = EXCLUDED.low_price,
+    close_price = EXCLUDED.close_price,
+    volume = EXCLUDED.volume
+"""
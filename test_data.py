@@ -20,16 +20,21 @@ def test_data_storage():
         # Create engine and test connection
         engine = create_engine(db_url)
         
-        # Query total records
+        # Query total and per-symbol counts in one pass; ROLLUP adds the grand total row
         with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM stock_data"))
-            total_records = result.scalar()
+            result = conn.execute(text("""
+                SELECT symbol, COUNT(*) as count 
+                FROM stock_data 
+                GROUP BY ROLLUP (symbol) 
+                ORDER BY symbol NULLS FIRST
+            """))
+            rows = result.fetchall()
+            total_records = rows[0].count if rows and rows[0].symbol is None else 0
             print(f"✅ Total records in database: {total_records}")
             
-            # Query records by symbol
-            result = conn.execute(text("SELECT symbol, COUNT(*) as count FROM stock_data GROUP BY symbol"))
-            for row in result:
-                print(f"   {row.symbol}: {row.count} records")
+            for row in rows:
+                if row.symbol is not None:
+                    print(f"   {row.symbol}: {row.count} records")
                 
             # Show latest records
             result = conn.execute(text("""